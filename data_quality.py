@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Data quality scoring for OHLCV bar series.
+All checks run over whole numpy arrays, so the same code scores a 10-bar API
+response inline and millions of archived bars in bulk.
+"""
+
+import numpy as np
+import pandas as pd
+
+INTERVAL_SECONDS = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+
+# Penalty per failed check, subtracted from a perfect bar score of 1.0
+PENALTIES = {
+    'ohlcViolation': 0.6,
+    'duplicateTimestamp': 0.5,
+    'outlierReturn': 0.3,
+    'staleRepeat': 0.2,
+    'zeroVolumeRun': 0.2,
+    'afterGap': 0.1,
+}
+ZERO_VOLUME_RUN_MIN = 2
+OUTLIER_Z = 6.0
+# Keeps near-constant series from turning every small move into an outlier
+OUTLIER_MAD_FLOOR = 1e-3
+OUTLIER_MIN_BARS = 5
+# Without a holiday calendar, a single skipped weekday in daily equity data is
+# taken to be an exchange holiday rather than a missing bar
+HOLIDAY_GAP_TOLERANCE = 1
+
+
+def score_series(timestamps, open_, high, low, close, volume, interval=None, trading_days_only=False,
+                 local_dates=None, holidays=None):
+    """Score a bar series given epoch-millisecond timestamps; returns (per-bar scores, summary).
+
+    For daily trading-day series, local_dates are the exchange-local calendar
+    dates of the bars (UTC dates otherwise) and holidays an optional list of
+    exchange holidays.
+    """
+    ts = np.asarray(timestamps, dtype='int64')
+    o = np.asarray(open_, dtype='float64')
+    h = np.asarray(high, dtype='float64')
+    l = np.asarray(low, dtype='float64')
+    c = np.asarray(close, dtype='float64')
+    v = np.asarray(volume, dtype='float64')
+    n = len(ts)
+    if n == 0:
+        return np.empty(0), {
+            'score': 0.0, 'bars': 0, 'missingIntervals': 0, 'duplicateTimestamps': 0,
+            'ohlcViolations': 0, 'zeroVolumeBars': 0, 'staleBars': 0, 'outlierReturns': 0
+        }
+
+    flags = {}
+    gaps = np.diff(ts)
+
+    # Missing intervals: whole steps skipped between consecutive bars
+    if trading_days_only and interval == '1d':
+        if local_dates is not None:
+            days = np.asarray(local_dates, dtype='datetime64[D]')
+        else:
+            days = ts.astype('datetime64[ms]').astype('datetime64[D]')
+        if holidays is not None:
+            missing = np.maximum(np.busday_count(days[:-1], days[1:], holidays=holidays) - 1, 0)
+        else:
+            missing = np.maximum(np.busday_count(days[:-1], days[1:]) - 1, 0)
+            missing[missing <= HOLIDAY_GAP_TOLERANCE] = 0
+    else:
+        step_ms = INTERVAL_SECONDS[interval] * 1000 if interval in INTERVAL_SECONDS else 0
+        if not step_ms and (gaps > 0).any():
+            step_ms = np.median(gaps[gaps > 0])
+        if step_ms:
+            missing = np.maximum(np.round(gaps / step_ms).astype('int64') - 1, 0)
+        else:
+            missing = np.zeros(n - 1, dtype='int64')
+    flags['afterGap'] = np.concatenate(([False], missing > 0))
+    flags['duplicateTimestamp'] = np.concatenate(([False], gaps == 0))
+
+    # OHLC invariants; NaN fails every comparison and is flagged too
+    valid = (h >= np.maximum(o, c)) & (l <= np.minimum(o, c)) & (l > 0) & (v >= 0)
+    flags['ohlcViolation'] = ~valid
+
+    # Zero-volume runs of at least ZERO_VOLUME_RUN_MIN bars
+    edges = np.diff(np.concatenate(([0], (v == 0).astype('int8'), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    long_runs = (ends - starts) >= ZERO_VOLUME_RUN_MIN
+    marks = np.zeros(n + 1, dtype='int64')
+    np.add.at(marks, starts[long_runs], 1)
+    np.add.at(marks, ends[long_runs], -1)
+    flags['zeroVolumeRun'] = np.cumsum(marks[:n]) > 0
+
+    # Stale prices: the whole bar repeats the previous one
+    same = (o[1:] == o[:-1]) & (h[1:] == h[:-1]) & (l[1:] == l[:-1]) & (c[1:] == c[:-1])
+    flags['staleRepeat'] = np.concatenate(([False], same))
+
+    # Outlier returns by robust z-score (median / MAD of log returns)
+    outliers = np.zeros(n - 1, dtype=bool)
+    if n >= OUTLIER_MIN_BARS:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.diff(np.log(c))
+        finite = np.isfinite(returns)
+        if finite.sum() >= OUTLIER_MIN_BARS - 1:
+            median = np.median(returns[finite])
+            mad = max(np.median(np.abs(returns[finite] - median)), OUTLIER_MAD_FLOOR)
+            with np.errstate(invalid='ignore'):
+                outliers = np.abs(0.6745 * (returns - median) / mad) > OUTLIER_Z
+    flags['outlierReturn'] = np.concatenate(([False], outliers))
+
+    penalty = np.zeros(n)
+    for name, weight in PENALTIES.items():
+        penalty += weight * flags[name]
+    scores = np.clip(1.0 - penalty, 0.0, 1.0)
+
+    missing_total = int(missing.sum())
+    coverage = n / (n + missing_total)
+    summary = {
+        'score': round(float(scores.mean() * coverage), 4),
+        'bars': n,
+        'missingIntervals': missing_total,
+        'duplicateTimestamps': int(flags['duplicateTimestamp'].sum()),
+        'ohlcViolations': int(flags['ohlcViolation'].sum()),
+        'zeroVolumeBars': int(flags['zeroVolumeRun'].sum()),
+        'staleBars': int(flags['staleRepeat'].sum()),
+        'outlierReturns': int(flags['outlierReturn'].sum()),
+    }
+    return scores, summary
+
+
+def score_bars(bars, interval=None, trading_days_only=False, holidays=None):
+    """Stamp a qualityScore on each bar dict and return the series summary"""
+    if not bars:
+        return score_series([], [], [], [], [], [], interval)[1]
+    timestamps = pd.to_datetime([bar['timestamp'] for bar in bars], utc=True)
+    # ISO timestamps start with the exchange-local date; UTC would move bars
+    # east of Greenwich onto the previous day
+    local_dates = [bar['timestamp'][:10] for bar in bars] if trading_days_only else None
+    scores, summary = score_series(
+        timestamps.values.astype('datetime64[ms]').astype('int64'),
+        [bar['open'] for bar in bars],
+        [bar['high'] for bar in bars],
+        [bar['low'] for bar in bars],
+        [bar['close'] for bar in bars],
+        [bar['volume'] for bar in bars],
+        interval,
+        trading_days_only,
+        local_dates,
+        holidays
+    )
+    for bar, score in zip(bars, scores.round(4).tolist()):
+        bar['qualityScore'] = score
+    return summary
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Background latency and availability monitor for upstream data sources.
+Each source is probed on a schedule; results land in rolling, fixed-size
+quantile sketches so p50/p99 and uptime can be read without probing.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QuantileSketch:
+    """Log-bucketed histogram with bounded relative error (DDSketch style)"""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.count = 0
+
+    def add(self, value):
+        key = math.ceil(math.log(max(value, 1e-3)) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        self.count += 1
+
+    def merge(self, other):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += other.count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return None
+
+
+class RollingStats:
+    """Latency sketch and up/down counts over a sliding window of time slots"""
+
+    def __init__(self, window_seconds=900, slot_seconds=60):
+        self.slot_seconds = slot_seconds
+        self.slots = deque(maxlen=max(1, window_seconds // slot_seconds))
+
+    def _current_slot(self, now):
+        start = int(now // self.slot_seconds) * self.slot_seconds
+        if not self.slots or self.slots[-1]['start'] != start:
+            self.slots.append({'start': start, 'sketch': QuantileSketch(), 'up': 0, 'down': 0})
+        return self.slots[-1]
+
+    def record(self, latency_ms, ok, now=None):
+        slot = self._current_slot(time.time() if now is None else now)
+        if ok:
+            slot['sketch'].add(latency_ms)
+            slot['up'] += 1
+        else:
+            slot['down'] += 1
+
+    def summary(self, now=None):
+        now = time.time() if now is None else now
+        cutoff = now - self.slots.maxlen * self.slot_seconds
+        sketch = QuantileSketch()
+        up = down = 0
+        for slot in self.slots:
+            if slot['start'] + self.slot_seconds <= cutoff:
+                continue
+            sketch.merge(slot['sketch'])
+            up += slot['up']
+            down += slot['down']
+
+        def rounded(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            'samples': up + down,
+            'uptime': round(up / (up + down), 4) if up + down else None,
+            'p50': rounded(sketch.quantile(0.5)),
+            'p90': rounded(sketch.quantile(0.9)),
+            'p99': rounded(sketch.quantile(0.99)),
+        }
+
+
+class LatencyMonitor:
+    """Probe every source concurrently on a schedule and keep rolling stats per source"""
+
+    def __init__(self, probes, interval_seconds=15, window_seconds=900, slot_seconds=60, source_intervals=None):
+        # probes maps a source name to a callable returning (ok, message);
+        # source_intervals overrides interval_seconds for sources that need gentler probing
+        self.probes = probes
+        self.interval_seconds = interval_seconds
+        self.source_intervals = source_intervals or {}
+        self.stats = {name: RollingStats(window_seconds, slot_seconds) for name in probes}
+        self.last = {}
+        self.in_flight = set()
+        self.running = False
+        self.lock = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(probes)), thread_name_prefix='probe')
+
+    def probe(self, name):
+        """Run one probe the caller has marked in flight, record it and return the result"""
+        start = time.time()
+        try:
+            ok, message = self.probes[name]()
+        except Exception as e:
+            ok, message = False, str(e)
+        latency_ms = (time.time() - start) * 1000
+        with self.lock:
+            self.stats[name].record(latency_ms, ok)
+            self.last[name] = {
+                'connected': ok,
+                'message': message,
+                'latency': int(latency_ms),
+                'probedAt': start,
+            }
+            self.in_flight.discard(name)
+            self.lock.notify_all()
+            return self.last[name]
+
+    def _run(self):
+        next_at = {name: 0 for name in self.probes}
+        while True:
+            now = time.time()
+            with self.lock:
+                # A probe still running from the last round is not queued again
+                due = [name for name in self.probes if next_at[name] <= now and name not in self.in_flight]
+                self.in_flight.update(due)
+            for name in due:
+                next_at[name] = now + self.source_intervals.get(name, self.interval_seconds)
+                self.executor.submit(self.probe, name)
+            time.sleep(max(min(next_at.values()) - time.time(), 0.1))
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, name='latency-monitor', daemon=True).start()
+
+    def status(self, name, timeout=10):
+        """Snapshot for a request: stored while the monitor runs, otherwise probed now.
+
+        A probe already in flight is waited for instead of started twice.
+        """
+        with self.lock:
+            if self.running and name in self.last:
+                return self.snapshot(name)
+            if name in self.in_flight:
+                self.lock.wait_for(lambda: name not in self.in_flight, timeout)
+                return self.snapshot(name)
+            self.in_flight.add(name)
+        self.probe(name)
+        return self.snapshot(name)
+
+    def snapshot(self, name):
+        """Latest probe plus rolling percentiles for one source, or None if never probed"""
+        with self.lock:
+            if name not in self.last:
+                return None
+            result = dict(self.last[name])
+            result.update(self.stats[name].summary())
+            return result
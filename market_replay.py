@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Record and replay upstream market data.
+In record mode every live upstream answer is appended to a JSON-lines file as
+[time_ms, kind, key, data]. In replay mode the file is loaded once and answers
+are served on one shared replay clock that runs at 1x to 1000x the recorded
+pace; REST lookups and tick streams all read the same clock.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_right
+
+MIN_SPEED = 1.0
+MAX_SPEED = 1000.0
+
+
+def clamp_speed(speed):
+    if isinstance(speed, bool) or not isinstance(speed, (int, float)):
+        raise ValueError('speed must be a number')
+    return min(max(float(speed), MIN_SPEED), MAX_SPEED)
+
+
+class MarketFeed:
+    """Pass-through, recording or replaying access to upstream market data"""
+
+    def __init__(self, mode='live', path='market-recording.jsonl', speed=1.0):
+        self.mode = mode
+        self.path = path
+        self.speed = clamp_speed(speed)
+        self.lock = threading.Lock()
+        self.file = None
+        self.index = {}
+        self.ticks = []
+        self.tick_times = []
+        self.first_ms = self.last_ms = 0
+        # The clock starts on the first replay request or an explicit start()
+        self.started = None
+        self.epoch = 0
+        if mode == 'record':
+            self.file = open(path, 'a', buffering=1, encoding='utf-8')
+        elif mode == 'replay':
+            self._load()
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def _load(self):
+        records = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+        # Writers on several threads can interleave by a few milliseconds
+        records.sort(key=lambda record: record[0])
+        for t, kind, key, data in records:
+            encoded = json.dumps(data, separators=(',', ':'))
+            times, values = self.index.setdefault((kind, tuple(key)), ([], []))
+            times.append(t)
+            values.append(encoded)
+            if kind == 'api' and key[1] == 'realtime':
+                self.ticks.append((t, key[0], key[2], encoded))
+        self.tick_times = [tick[0] for tick in self.ticks]
+        if records:
+            self.first_ms, self.last_ms = records[0][0], records[-1][0]
+
+    def fetch(self, kind, key, fetcher):
+        """Answer from the recording when replaying, otherwise call fetcher (and record)"""
+        if self.replaying:
+            return self.lookup(kind, key)
+        data = fetcher()
+        if data is not None and self.file is not None:
+            line = json.dumps([int(time.time() * 1000), kind, list(key), data], separators=(',', ':'))
+            with self.lock:
+                self.file.write(line + '\n')
+        return data
+
+    def start(self, speed=None):
+        """Start or rewind the replay clock, optionally at a new speed.
+
+        Open tick streams notice the new epoch and rewind with it.
+        """
+        speed = None if speed is None else clamp_speed(speed)
+        with self.lock:
+            if speed is not None:
+                self.speed = speed
+            self.started = time.time()
+            self.epoch += 1
+
+    def clock(self):
+        """(epoch, replay time in ms), read together; starts the clock on first use"""
+        with self.lock:
+            if self.started is None:
+                self.started = time.time()
+                self.epoch += 1
+            elapsed_ms = (time.time() - self.started) * 1000 * self.speed
+            return self.epoch, min(self.first_ms + elapsed_ms, self.last_ms)
+
+    def replay_time_ms(self):
+        return self.clock()[1]
+
+    def lookup(self, kind, key):
+        """Latest recorded answer at the current replay time, or None before the first one"""
+        entry = self.index.get((kind, tuple(key)))
+        if entry is None:
+            return None
+        times, values = entry
+        i = bisect_right(times, self.replay_time_ms()) - 1
+        if i < 0:
+            return None
+        return json.loads(values[i])
+
+    def replay_ticks(self, source=None, symbol=None):
+        """Yield batches of (source, symbol, encoded tick) in recorded order on the shared clock.
+
+        A stream joins at the latest tick already due. Everything due is sent as
+        one batch, so a slow consumer does not fall behind, and a rewind of the
+        clock rewinds the stream with it.
+        """
+        if not self.ticks:
+            return
+        epoch, now_ms = self.clock()
+        i = max(bisect_right(self.tick_times, now_ms) - 1, 0)
+        while i < len(self.ticks):
+            now_epoch, now_ms = self.clock()
+            if now_epoch != epoch:
+                epoch = now_epoch
+                i = 0
+            j = bisect_right(self.tick_times, now_ms, lo=i)
+            if j == i:
+                # Short sleeps so a rewind or speed change is picked up quickly
+                time.sleep(min((self.tick_times[i] - now_ms) / self.speed / 1000, 0.25))
+                continue
+            batch = [
+                (tick_source, tick_symbol, encoded)
+                for _, tick_source, tick_symbol, encoded in self.ticks[i:j]
+                if (source is None or tick_source == source) and (symbol is None or tick_symbol == symbol)
+            ]
+            i = j
+            if batch:
+                yield batch
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-request tracing for the data gateway.
+Handlers wrap expensive stages in span(); while tracing is off span() hands back
+a shared no-op object, so instrumented code costs a thread-local lookup.
+"""
+
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import random
+import threading
+import time
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace['spans'].append({
+            'name': self.name,
+            'offsetMs': round((self.start - self.trace['perfStart']) * 1000, 3),
+            'durationMs': round((time.perf_counter() - self.start) * 1000, 3),
+        })
+        return False
+
+
+class RequestTracer:
+    """Record stage spans per request and keep the slowest ones in memory"""
+
+    def __init__(self, enabled=False, profile_rate=0.0, slowest=50):
+        self.enabled = enabled
+        self.profile_rate = profile_rate
+        self.slowest = slowest
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # Only one cProfile session may be active at a time
+        self.profile_lock = threading.Lock()
+        self.heap = []
+        self.counter = itertools.count()
+
+    def span(self, name):
+        trace = getattr(self.local, 'trace', None)
+        if trace is None:
+            return NOOP_SPAN
+        return _Span(trace, name)
+
+    def begin(self, method, path):
+        if getattr(self.local, 'trace', None) is not None:
+            # A request on this thread ended without teardown; release its profiler
+            self.end()
+        if not self.enabled:
+            return
+        trace = {
+            'method': method,
+            'path': path,
+            'startedAt': time.time(),
+            'perfStart': time.perf_counter(),
+            'spans': [],
+            'profile': None,
+        }
+        if self.profile_rate and random.random() < self.profile_rate and self.profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            trace['profiler'] = profiler
+            profiler.enable()
+        self.local.trace = trace
+
+    def set_status(self, status):
+        trace = getattr(self.local, 'trace', None)
+        if trace is not None:
+            trace['status'] = status
+
+    def end(self, error=None):
+        """Close the current trace; safe to call after a failed request"""
+        trace = getattr(self.local, 'trace', None)
+        if trace is None:
+            return
+        self.local.trace = None
+        duration_ms = (time.perf_counter() - trace.pop('perfStart')) * 1000
+        profiler = trace.pop('profiler', None)
+        if profiler is not None:
+            try:
+                profiler.disable()
+                trace['profile'] = self._profile_summary(profiler)
+            finally:
+                self.profile_lock.release()
+        if error is not None:
+            trace['status'] = 500
+            trace['error'] = repr(error)
+        trace.setdefault('status', None)
+        trace['durationMs'] = round(duration_ms, 3)
+
+        with self.lock:
+            entry = (duration_ms, next(self.counter), trace)
+            if len(self.heap) < self.slowest:
+                heapq.heappush(self.heap, entry)
+            elif duration_ms > self.heap[0][0]:
+                heapq.heapreplace(self.heap, entry)
+
+    def _profile_summary(self, profiler, limit=20):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    def configure(self, enabled=None, profile_rate=None, slowest=None):
+        """Update settings; raises ValueError without changing anything on bad input"""
+        if enabled is not None and not isinstance(enabled, bool):
+            raise ValueError('enabled must be true or false')
+        if profile_rate is not None:
+            if isinstance(profile_rate, bool) or not isinstance(profile_rate, (int, float)) or not 0 <= profile_rate <= 1:
+                raise ValueError('profileRate must be a number between 0 and 1')
+        if slowest is not None:
+            if isinstance(slowest, bool) or not isinstance(slowest, int) or slowest < 1:
+                raise ValueError('slowest must be a positive integer')
+        with self.lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if profile_rate is not None:
+                self.profile_rate = float(profile_rate)
+            if slowest is not None:
+                self.slowest = slowest
+                while len(self.heap) > self.slowest:
+                    heapq.heappop(self.heap)
+
+    def dump(self):
+        """Current settings plus the slowest traced requests, slowest first"""
+        with self.lock:
+            traces = [trace for _, _, trace in sorted(self.heap, reverse=True)]
+            return {
+                'enabled': self.enabled,
+                'profileRate': self.profile_rate,
+                'slowest': self.slowest,
+                'requests': traces,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.heap = []
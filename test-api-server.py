@@ -1,22 +1,99 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import os
+import socket
+import ssl
 import time
 import json
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import random
 import requests
 import yfinance as yf
 
+from data_quality import score_bars
+from latency_monitor import LatencyMonitor
+from request_tracing import RequestTracer
+from market_replay import MarketFeed
+
 app = Flask(__name__)
 
+# Encoded response cache: seconds a historical response stays fresh, per bar interval
+RESPONSE_CACHE_TTL = {'1m': 5, '5m': 15, '1h': 60, '1d': 300}
+RESPONSE_CACHE_MAX_ENTRIES = 512
+MARKET_SNAPSHOT_TTL = 10
+LIVE_SOURCES = ('yahoo', 'binance')
+CACHED_API_TYPES = ('market', 'historical')
+
+# Background prefetch: configured watchlist as "source:SYMBOL" pairs, e.g. "binance:BTCUSDT,yahoo:AAPL"
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', '1') == '1'
+PREFETCH_WATCHLIST = os.environ.get('PREFETCH_WATCHLIST', '')
+PREFETCH_INTERVALS = os.environ.get('PREFETCH_INTERVALS', '1h').split(',')
+PREFETCH_LEARNED_MAX = 32
+PREFETCH_WATCH_MAX_KEYS = 1024
+PREFETCH_IDLE_SECONDS = 600
+PREFETCH_LEAD_FRACTION = 0.2
+# Failed refreshes back off exponentially between these bounds (seconds)
+PREFETCH_FAILURE_BACKOFF = 30
+PREFETCH_FAILURE_BACKOFF_MAX = 600
+PREFETCH_MAX_CALLS_PER_MINUTE = int(os.environ.get('PREFETCH_MAX_CALLS_PER_MINUTE', '60'))
+
+# Latency monitor: sources probed in the background and how often
+PROBE_SOURCES = [name.strip() for name in os.environ.get('PROBE_SOURCES', 'yahoo,binance,binance-ws,okx').split(',')]
+PROBE_INTERVAL_SECONDS = int(os.environ.get('PROBE_INTERVAL_SECONDS', '15'))
+# Yahoo throttles aggressive clients, and it serves the real /data-test calls too
+PROBE_SOURCE_INTERVALS = {'yahoo': int(os.environ.get('PROBE_YAHOO_INTERVAL_SECONDS', '60'))}
+PROBE_ALIASES = {'yahoo finance': 'yahoo', 'binance websocket': 'binance-ws'}
+
+# Market feed: 'live', 'record' (append upstream answers to MARKET_RECORD_FILE) or 'replay'
+market_feed = MarketFeed(
+    mode=os.environ.get('MARKET_MODE', 'live'),
+    path=os.environ.get('MARKET_RECORD_FILE', 'market-recording.jsonl'),
+    speed=float(os.environ.get('REPLAY_SPEED', '1'))
+)
+STREAM_POLL_SECONDS = 1
+# Shared ticks idle this long are dropped when a new stream key is added
+STREAM_IDLE_SECONDS = 60
+
+# Request tracing is off unless enabled here or at runtime via /debug/tracing
+tracer = RequestTracer(
+    enabled=os.environ.get('TRACING_ENABLED', '0') == '1',
+    profile_rate=float(os.environ.get('TRACING_PROFILE_RATE', '0')),
+    slowest=int(os.environ.get('TRACING_SLOWEST', '50'))
+)
+
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+_watch_hits = {}
+_prefetch_failures = {}
+_watch_lock = threading.Lock()
+
 # Add CORS headers manually
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    response.headers.add('Access-Control-Expose-Headers', 'ETag')
     return response
 
+@app.before_request
+def begin_trace():
+    tracer.begin(request.method, request.path)
+
+@app.after_request
+def note_trace_status(response):
+    tracer.set_status(response.status_code)
+    return response
+
+# Teardown also runs when an exception propagates, so the profiler is always released
+@app.teardown_request
+def end_trace(error=None):
+    tracer.end(error)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
@@ -25,6 +102,29 @@ def health_check():
         'version': '1.0.0'
     })
 
+@app.route('/debug/tracing', methods=['GET', 'POST', 'DELETE'])
+def tracing():
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            tracer.configure(
+                enabled=data.get('enabled'),
+                profile_rate=data.get('profileRate'),
+                slowest=data.get('slowest')
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid tracing settings',
+                'error': str(e)
+            }), 400
+    elif request.method == 'DELETE':
+        tracer.clear()
+    return jsonify({
+        'success': True,
+        'data': tracer.dump()
+    })
+
 @app.route('/data-test/test-connection', methods=['POST'])
 def test_connection():
     try:
@@ -34,63 +134,61 @@ def test_connection():
         
         print(f"Testing connection to {source} ({connection_type})")
         
-        start_time = time.time()
-        
-        # Test real connection to the data source
-        if source.lower() == 'yahoo':
-            # Test Yahoo Finance connection
-            try:
-                test_ticker = yf.Ticker('AAPL')
-                info = test_ticker.info
-                if info and 'regularMarketPrice' in info:
-                    is_connected = True
-                    message = 'Yahoo Finance connection successful'
-                else:
-                    is_connected = False
-                    message = 'Yahoo Finance returned invalid data'
-            except Exception as e:
-                is_connected = False
-                message = f'Yahoo Finance connection failed: {str(e)}'
-        
-        elif source.lower() == 'binance':
-            # Test Binance API connection
-            try:
-                response = requests.get('https://api.binance.com/api/v3/ping', timeout=5)
-                if response.status_code == 200:
-                    is_connected = True
-                    message = 'Binance API connection successful'
-                else:
-                    is_connected = False
-                    message = f'Binance API returned status {response.status_code}'
-            except Exception as e:
-                is_connected = False
-                message = f'Binance API connection failed: {str(e)}'
+        if market_feed.replaying:
+            return jsonify({
+                'success': True,
+                'message': f'{source} is served from the market recording',
+                'data': {
+                    'source': source,
+                    'type': connection_type,
+                    'connected': True,
+                    'latency': 0,
+                    'mode': 'replay',
+                    'timestamp': datetime.now().isoformat()
+                }
+            })
         
-        else:
-            # For other sources, use mock data
-            time.sleep(1)
-            is_connected = random.random() > 0.2
-            message = f'{source} connection test successful' if is_connected else f'{source} connection timeout'
+        probe_name = PROBE_ALIASES.get(source.lower(), source.lower())
+        if probe_name not in latency_monitor.probes:
+            message = f'No latency probe configured for {source}'
+            return jsonify({
+                'success': False,
+                'message': message,
+                'error': message
+            }), 404
         
-        latency = int((time.time() - start_time) * 1000)
+        # Served from the background monitor; probed inline only when it has nothing current
+        status = latency_monitor.status(probe_name)
+        if status is None:
+            message = f'{source} probe did not finish in time'
+            return jsonify({
+                'success': False,
+                'message': message,
+                'error': message
+            }), 503
         
-        if is_connected:
+        if status['connected']:
             return jsonify({
                 'success': True,
-                'message': message,
+                'message': status['message'],
                 'data': {
                     'source': source,
                     'type': connection_type,
                     'connected': True,
-                    'latency': latency,
-                    'timestamp': datetime.now().isoformat()
+                    'latency': status['latency'],
+                    'p50': status['p50'],
+                    'p90': status['p90'],
+                    'p99': status['p99'],
+                    'uptime': status['uptime'],
+                    'samples': status['samples'],
+                    'timestamp': datetime.fromtimestamp(status['probedAt']).isoformat()
                 }
             })
         else:
             return jsonify({
                 'success': False,
-                'message': message,
-                'error': message
+                'message': status['message'],
+                'error': status['message']
             }), 500
     except Exception as e:
         return jsonify({
@@ -99,96 +197,148 @@ def test_connection():
             'error': str(e)
         }), 500
 
-@app.route('/data-test/sample', methods=['POST'])
+@app.route('/data-test/latency', methods=['GET'])
+def get_latency():
+    return jsonify({
+        'success': True,
+        'data': {name: latency_monitor.snapshot(name) for name in latency_monitor.probes}
+    })
+
+@app.route('/data-test/stream', methods=['GET'])
+def stream_ticks():
+    source = request.args.get('source', 'binance').lower()
+    symbol = request.args.get('symbol', 'BTCUSDT')
+    
+    if source not in LIVE_SOURCES:
+        message = f'No realtime stream for {source}'
+        return jsonify({
+            'success': False,
+            'message': message,
+            'error': message
+        }), 404
+    
+    def replay_events():
+        for batch in market_feed.replay_ticks(source, symbol):
+            yield ''.join(f'data: {encoded}\n\n' for _, _, encoded in batch)
+    
+    def live_events():
+        last_fetched_at = None
+        while True:
+            fetched_at, encoded = latest_tick(source, symbol)
+            if encoded is not None and fetched_at != last_fetched_at:
+                last_fetched_at = fetched_at
+                yield f'data: {encoded}\n\n'
+            time.sleep(STREAM_POLL_SECONDS)
+    
+    events = replay_events() if market_feed.replaying else live_events()
+    return Response(events, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+# Latest realtime tick per (source, symbol), shared by every stream client
+live_ticks = {}
+live_ticks_lock = threading.Lock()
+
+def latest_tick(source, symbol):
+    """(fetched_at, encoded tick) for a stream; upstream is polled at most once per STREAM_POLL_SECONDS"""
+    key = (source, symbol)
+    with live_ticks_lock:
+        entry = live_ticks.get(key)
+        if entry is None:
+            now = time.time()
+            for stale in [k for k, e in live_ticks.items() if now - e['fetchedAt'] > STREAM_IDLE_SECONDS]:
+                del live_ticks[stale]
+            entry = live_ticks[key] = {'fetchedAt': 0, 'encoded': None, 'lock': threading.Lock()}
+    # Clients of the same stream wait for one upstream call instead of making their own
+    with entry['lock']:
+        if time.time() - entry['fetchedAt'] >= STREAM_POLL_SECONDS:
+            tick = fetch_market_data(source, 'realtime', symbol, None)
+            entry['fetchedAt'] = time.time()
+            entry['encoded'] = json.dumps(tick, separators=(',', ':')) if tick is not None else None
+        return entry['fetchedAt'], entry['encoded']
+
+@app.route('/data-test/replay', methods=['GET', 'POST'])
+def replay_control():
+    if not market_feed.replaying:
+        return jsonify({
+            'success': False,
+            'message': 'Server is not in replay mode',
+            'error': f'MARKET_MODE is {market_feed.mode}'
+        }), 409
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            market_feed.start(data.get('speed'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid replay settings',
+                'error': str(e)
+            }), 400
+        with _response_cache_lock:
+            _response_cache.clear()
+    replay_time = None
+    if market_feed.started is not None:
+        replay_time = datetime.fromtimestamp(market_feed.replay_time_ms() / 1000).isoformat()
+    return jsonify({
+        'success': True,
+        'data': {
+            'speed': market_feed.speed,
+            'replayTime': replay_time,
+            'start': datetime.fromtimestamp(market_feed.first_ms / 1000).isoformat(),
+            'end': datetime.fromtimestamp(market_feed.last_ms / 1000).isoformat(),
+            'ticks': len(market_feed.ticks)
+        }
+    })
+
+@app.route('/data-test/sample', methods=['GET', 'POST'])
 def get_sample_data():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or request.args
         source = data.get('source', 'generic')
         symbol = data.get('symbol', 'BTCUSDT')
-        limit = data.get('limit', 5)
+        limit = int(data.get('limit', 5))
         
         print(f"Getting sample data from {source} for {symbol}")
         
-        # Get real sample data from source
-        if source.lower() == 'yahoo':
-            # Get real data from Yahoo Finance
-            try:
-                # Convert crypto symbol to Yahoo format
-                yahoo_symbol = symbol
-                if symbol.endswith('USDT'):
-                    yahoo_symbol = symbol.replace('USDT', '-USD')
-                
-                ticker = yf.Ticker(yahoo_symbol)
-                hist = ticker.history(period=f"{limit}d", interval='1d')
-                
-                if not hist.empty:
-                    sample_data = []
-                    for index, row in hist.iterrows():
-                        sample_data.append({
-                            'symbol': symbol,
-                            'timestamp': index.isoformat(),
-                            'open': float(row['Open']),
-                            'high': float(row['High']),
-                            'low': float(row['Low']),
-                            'close': float(row['Close']),
-                            'volume': int(row['Volume']),
-                            'source': 'yahoo',
-                            'qualityScore': 0.95
-                        })
-                        if len(sample_data) >= limit:
-                            break
-                else:
-                    # Fallback to generated data
-                    sample_data = generate_yahoo_sample_data(symbol, limit)
-                    
-            except Exception as e:
-                print(f"Yahoo Finance API error: {e}")
-                sample_data = generate_yahoo_sample_data(symbol, limit)
+        cache_key = ('sample', source.lower(), symbol, limit)
+        cached = get_cached_response(cache_key)
+        if cached:
+            return send_cached_response(cached)
         
-        elif source.lower() == 'binance':
-            # Get real data from Binance API
-            try:
-                response = requests.get(
-                    f'https://api.binance.com/api/v3/klines',
-                    params={
-                        'symbol': symbol,
-                        'interval': '1d',
-                        'limit': limit
-                    },
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    klines = response.json()
-                    sample_data = []
-                    for kline in klines:
-                        sample_data.append({
-                            'symbol': symbol,
-                            'timestamp': datetime.fromtimestamp(kline[0]/1000).isoformat(),
-                            'open': float(kline[1]),
-                            'high': float(kline[2]),
-                            'low': float(kline[3]),
-                            'close': float(kline[4]),
-                            'volume': float(kline[5]),
-                            'source': 'binance'
-                        })
-                else:
-                    # Fallback to generated data
-                    sample_data = generate_exchange_sample_data(symbol, limit)
-                    
-            except Exception as e:
-                print(f"Binance API error: {e}")
-                sample_data = generate_exchange_sample_data(symbol, limit)
+        sample_data = None
+        if source.lower() in LIVE_SOURCES:
+            sample_data = market_feed.fetch(
+                'sample', [source.lower(), symbol, limit],
+                lambda: fetch_sample_data(source.lower(), symbol, limit)
+            )
+        is_live = sample_data is not None
         
-        else:
-            # For other sources, use generated data
-            sample_data = generate_generic_sample_data(symbol, limit)
+        if not is_live:
+            # Fallback to generated data
+            if source.lower() == 'yahoo':
+                sample_data = generate_yahoo_sample_data(symbol, limit)
+            elif source.lower() == 'binance':
+                sample_data = generate_exchange_sample_data(symbol, limit)
+            else:
+                sample_data = generate_generic_sample_data(symbol, limit)
         
-        return jsonify({
+        payload = {
             'success': True,
             'message': 'Sample data retrieved successfully',
             'data': sample_data
-        })
+        }
+        # Generated bars are not daily; let the scorer infer their spacing
+        quality_interval = '1d' if is_live else None
+        with tracer.span('quality_score'):
+            payload['quality'] = score_bars(
+                sample_data, quality_interval, is_live and is_trading_days_only(source.lower(), symbol)
+            )
+        if is_live:
+            return send_cached_response(
+                store_response(cache_key, payload, sample_data, RESPONSE_CACHE_TTL['1d'])
+            )
+        with tracer.span('json_encode'):
+            response = jsonify(payload)
+        return response
     except Exception as e:
         return jsonify({
             'success': False,
@@ -196,10 +346,10 @@ def get_sample_data():
             'error': str(e)
         }), 500
 
-@app.route('/data-test/test-api', methods=['POST'])
+@app.route('/data-test/test-api', methods=['GET', 'POST'])
 def test_api():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or request.args
         source = data.get('source', 'generic')
         api_type = data.get('apiType', 'market')
         symbol = data.get('symbol', 'BTCUSDT')
@@ -207,28 +357,33 @@ def test_api():
         
         print(f"Testing API {source} {api_type} for {symbol}")
         
+        key_interval = api_key_interval(api_type, interval)
+        
         # Test real API calls
-        if source.lower() == 'yahoo':
-            test_data = test_yahoo_api(api_type, symbol, interval)
-        elif source.lower() == 'binance':
-            test_data = test_binance_api(api_type, symbol, interval)
+        if source.lower() in LIVE_SOURCES and api_type in CACHED_API_TYPES:
+            cache_key = ('test-api', source.lower(), api_type, symbol, key_interval)
+            entry = get_cached_response(cache_key) or refresh_test_api(source.lower(), api_type, symbol, key_interval)
+            if entry:
+                note_watch_request(source.lower(), api_type, symbol, key_interval)
+                return send_cached_response(entry)
+            test_data = None
+        elif source.lower() in LIVE_SOURCES:
+            test_data = fetch_market_data(source.lower(), api_type, symbol, key_interval)
         else:
             # For other sources, use generated data
             time.sleep(1.5)
-            if api_type == 'market':
-                test_data = generate_market_data_sample(symbol)
-            elif api_type == 'historical':
-                test_data = generate_historical_data_sample(symbol, interval)
-            elif api_type == 'realtime':
-                test_data = generate_realtime_data_sample(symbol)
-            else:
-                test_data = generate_generic_sample_data(symbol, 1)
+            test_data = None
         
-        return jsonify({
+        if test_data is None:
+            test_data = generate_api_sample(api_type, symbol, interval)
+        payload = {
             'success': True,
             'message': 'API test successful',
             'data': test_data
-        })
+        }
+        with tracer.span('json_encode'):
+            response = jsonify(payload)
+        return response
     except Exception as e:
         return jsonify({
             'success': False,
@@ -236,8 +391,80 @@ def test_api():
             'error': str(e)
         }), 500
 
+def fetch_sample_data(source, symbol, limit):
+    """Fetch daily sample bars from Yahoo or Binance, returning None when no live data is available"""
+    if source == 'yahoo':
+        # Get real data from Yahoo Finance
+        try:
+            # Convert crypto symbol to Yahoo format
+            yahoo_symbol = symbol
+            if symbol.endswith('USDT'):
+                yahoo_symbol = symbol.replace('USDT', '-USD')
+
+            ticker = yf.Ticker(yahoo_symbol)
+            with tracer.span('yfinance'):
+                hist = ticker.history(period=f"{limit}d", interval='1d')
+
+            if not hist.empty:
+                with tracer.span('dataframe_convert'):
+                    sample_data = []
+                    for index, row in hist.iterrows():
+                        sample_data.append({
+                            'symbol': symbol,
+                            'timestamp': index.isoformat(),
+                            'open': float(row['Open']),
+                            'high': float(row['High']),
+                            'low': float(row['Low']),
+                            'close': float(row['Close']),
+                            'volume': int(row['Volume']),
+                            'source': 'yahoo'
+                        })
+                        if len(sample_data) >= limit:
+                            break
+                return sample_data
+
+        except Exception as e:
+            print(f"Yahoo Finance API error: {e}")
+            return None
+
+    elif source == 'binance':
+        # Get real data from Binance API
+        try:
+            with tracer.span('upstream_http'):
+                response = requests.get(
+                    f'https://api.binance.com/api/v3/klines',
+                    params={
+                        'symbol': symbol,
+                        'interval': '1d',
+                        'limit': limit
+                    },
+                    timeout=10
+                )
+
+            if response.status_code == 200:
+                klines = response.json()
+                with tracer.span('dataframe_convert'):
+                    sample_data = []
+                    for kline in klines:
+                        sample_data.append({
+                            'symbol': symbol,
+                            'timestamp': datetime.fromtimestamp(kline[0]/1000).isoformat(),
+                            'open': float(kline[1]),
+                            'high': float(kline[2]),
+                            'low': float(kline[3]),
+                            'close': float(kline[4]),
+                            'volume': float(kline[5]),
+                            'source': 'binance'
+                        })
+                return sample_data
+
+        except Exception as e:
+            print(f"Binance API error: {e}")
+            return None
+    return None
+
 def test_yahoo_api(api_type, symbol, interval):
-    """Test Yahoo Finance API calls"""
+    """Test Yahoo Finance API calls, returning None when no live data is available"""
     try:
         # Convert crypto symbol to Yahoo format
         yahoo_symbol = symbol
@@ -248,7 +475,8 @@ def test_yahoo_api(api_type, symbol, interval):
         
         if api_type == 'market':
             # Get current market data
-            info = ticker.info
+            with tracer.span('yfinance'):
+                info = ticker.info
             return {
                 'symbol': symbol,
                 'price': info.get('regularMarketPrice', 0),
@@ -263,17 +491,19 @@ def test_yahoo_api(api_type, symbol, interval):
         
         elif api_type == 'historical':
             # Get historical data
-            hist = ticker.history(period='5d', interval='1d')
-            data = []
-            for index, row in hist.iterrows():
-                data.append({
-                    'timestamp': index.isoformat(),
-                    'open': float(row['Open']),
-                    'high': float(row['High']),
-                    'low': float(row['Low']),
-                    'close': float(row['Close']),
-                    'volume': int(row['Volume'])
-                })
+            with tracer.span('yfinance'):
+                hist = ticker.history(period='5d', interval='1d')
+            with tracer.span('dataframe_convert'):
+                data = []
+                for index, row in hist.iterrows():
+                    data.append({
+                        'timestamp': index.isoformat(),
+                        'open': float(row['Open']),
+                        'high': float(row['High']),
+                        'low': float(row['Low']),
+                        'close': float(row['Close']),
+                        'volume': int(row['Volume'])
+                    })
             
             return {
                 'symbol': symbol,
@@ -284,7 +514,8 @@ def test_yahoo_api(api_type, symbol, interval):
         
         elif api_type == 'realtime':
             # Get real-time data (simulate with current price)
-            info = ticker.info
+            with tracer.span('yfinance'):
+                info = ticker.info
             return {
                 'symbol': symbol,
                 'price': info.get('regularMarketPrice', 0),
@@ -295,30 +526,23 @@ def test_yahoo_api(api_type, symbol, interval):
             }
         
         else:
-            return generate_generic_sample_data(symbol, 1)
+            return None
             
     except Exception as e:
         print(f"Yahoo Finance API error: {e}")
-        # Fallback to generated data
-        if api_type == 'market':
-            return generate_market_data_sample(symbol)
-        elif api_type == 'historical':
-            return generate_historical_data_sample(symbol, interval)
-        elif api_type == 'realtime':
-            return generate_realtime_data_sample(symbol)
-        else:
-            return generate_generic_sample_data(symbol, 1)
+        return None
 
 def test_binance_api(api_type, symbol, interval):
-    """Test Binance API calls"""
+    """Test Binance API calls, returning None when no live data is available"""
     try:
         if api_type == 'market':
             # Get 24hr ticker price change statistics
-            response = requests.get(
-                f'https://api.binance.com/api/v3/ticker/24hr',
-                params={'symbol': symbol},
-                timeout=10
-            )
+            with tracer.span('upstream_http'):
+                response = requests.get(
+                    f'https://api.binance.com/api/v3/ticker/24hr',
+                    params={'symbol': symbol},
+                    timeout=10
+                )
             
             if response.status_code == 200:
                 data = response.json()
@@ -339,28 +563,30 @@ def test_binance_api(api_type, symbol, interval):
             interval_map = {'1m': '1m', '5m': '5m', '1h': '1h', '1d': '1d'}
             binance_interval = interval_map.get(interval, '1h')
             
-            response = requests.get(
-                f'https://api.binance.com/api/v3/klines',
-                params={
-                    'symbol': symbol,
-                    'interval': binance_interval,
-                    'limit': 10
-                },
-                timeout=10
-            )
+            with tracer.span('upstream_http'):
+                response = requests.get(
+                    f'https://api.binance.com/api/v3/klines',
+                    params={
+                        'symbol': symbol,
+                        'interval': binance_interval,
+                        'limit': 10
+                    },
+                    timeout=10
+                )
             
             if response.status_code == 200:
                 klines = response.json()
-                data = []
-                for kline in klines:
-                    data.append({
-                        'timestamp': datetime.fromtimestamp(kline[0]/1000).isoformat(),
-                        'open': float(kline[1]),
-                        'high': float(kline[2]),
-                        'low': float(kline[3]),
-                        'close': float(kline[4]),
-                        'volume': float(kline[5])
-                    })
+                with tracer.span('dataframe_convert'):
+                    data = []
+                    for kline in klines:
+                        data.append({
+                            'timestamp': datetime.fromtimestamp(kline[0]/1000).isoformat(),
+                            'open': float(kline[1]),
+                            'high': float(kline[2]),
+                            'low': float(kline[3]),
+                            'close': float(kline[4]),
+                            'volume': float(kline[5])
+                        })
                 
                 return {
                     'symbol': symbol,
@@ -371,11 +597,12 @@ def test_binance_api(api_type, symbol, interval):
         
         elif api_type == 'realtime':
             # Get order book (simulate real-time data)
-            response = requests.get(
-                f'https://api.binance.com/api/v3/ticker/price',
-                params={'symbol': symbol},
-                timeout=10
-            )
+            with tracer.span('upstream_http'):
+                response = requests.get(
+                    f'https://api.binance.com/api/v3/ticker/price',
+                    params={'symbol': symbol},
+                    timeout=10
+                )
             
             if response.status_code == 200:
                 data = response.json()
@@ -386,27 +613,241 @@ def test_binance_api(api_type, symbol, interval):
                     'source': 'binance-api'
                 }
         
-        # Fallback to generated data
-        if api_type == 'market':
-            return generate_market_data_sample(symbol)
-        elif api_type == 'historical':
-            return generate_historical_data_sample(symbol, interval)
-        elif api_type == 'realtime':
-            return generate_realtime_data_sample(symbol)
-        else:
-            return generate_generic_sample_data(symbol, 1)
+        return None
             
     except Exception as e:
         print(f"Binance API error: {e}")
-        # Fallback to generated data
-        if api_type == 'market':
-            return generate_market_data_sample(symbol)
-        elif api_type == 'historical':
-            return generate_historical_data_sample(symbol, interval)
-        elif api_type == 'realtime':
-            return generate_realtime_data_sample(symbol)
+        return None
+
+def probe_yahoo():
+    """Check Yahoo Finance with a one-day history request (one call, unlike a full quote scrape)"""
+    try:
+        hist = yf.Ticker('AAPL').history(period='1d')
+        if not hist.empty:
+            return True, 'Yahoo Finance connection successful'
+        return False, 'Yahoo Finance returned invalid data'
+    except Exception as e:
+        return False, f'Yahoo Finance connection failed: {str(e)}'
+
+def probe_binance():
+    """Check Binance with its ping endpoint"""
+    try:
+        response = requests.get('https://api.binance.com/api/v3/ping', timeout=5)
+        if response.status_code == 200:
+            return True, 'Binance API connection successful'
+        return False, f'Binance API returned status {response.status_code}'
+    except Exception as e:
+        return False, f'Binance API connection failed: {str(e)}'
+
+def probe_binance_ws():
+    """Check the Binance WebSocket endpoint accepts a TLS connection"""
+    try:
+        with socket.create_connection(('stream.binance.com', 9443), timeout=5) as sock:
+            with ssl.create_default_context().wrap_socket(sock, server_hostname='stream.binance.com'):
+                return True, 'Binance WebSocket endpoint reachable'
+    except Exception as e:
+        return False, f'Binance WebSocket connection failed: {str(e)}'
+
+def probe_okx():
+    """Check OKX with its public server time endpoint"""
+    try:
+        response = requests.get('https://www.okx.com/api/v5/public/time', timeout=5)
+        if response.status_code == 200:
+            return True, 'OKX API connection successful'
+        return False, f'OKX API returned status {response.status_code}'
+    except Exception as e:
+        return False, f'OKX API connection failed: {str(e)}'
+
+def generate_api_sample(api_type, symbol, interval):
+    """Generate fallback data when a source has no live answer"""
+    if api_type == 'market':
+        return generate_market_data_sample(symbol)
+    elif api_type == 'historical':
+        return generate_historical_data_sample(symbol, interval)
+    elif api_type == 'realtime':
+        return generate_realtime_data_sample(symbol)
+    else:
+        return generate_generic_sample_data(symbol, 1)
+
+def series_etag(key, bars):
+    """Strong ETag from the bar count and the last (possibly still open) bar"""
+    last = bars[-1] if bars else {}
+    fingerprint = f"{key}|{len(bars)}|{last.get('timestamp')}|{last.get('close')}|{last.get('volume')}"
+    return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+def get_cached_response(key):
+    """Return the cached response for key if it has not expired"""
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None:
+            return None
+        if entry['expires_at'] <= time.time():
+            del _response_cache[key]
+            return None
+        _response_cache.move_to_end(key)
+        return entry
+
+def store_response(key, payload, bars, ttl):
+    """Encode payload once and keep the bytes with their ETag"""
+    etag = series_etag(key, bars)
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None or entry['etag'] != etag:
+            with tracer.span('json_encode'):
+                body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            entry = {'etag': etag, 'body': body}
+        if market_feed.replaying:
+            # TTLs are in market time; the replay clock runs faster
+            ttl = ttl / market_feed.speed
+        entry['ttl'] = ttl
+        entry['expires_at'] = time.time() + ttl
+        _response_cache[key] = entry
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+            _response_cache.popitem(last=False)
+    return entry
+
+def send_cached_response(entry):
+    """Serve pre-encoded bytes, or 304 when the client already has them"""
+    if request.if_none_match.contains(entry['etag']):
+        response = Response(status=304)
+    else:
+        response = Response(entry['body'], mimetype='application/json')
+    response.set_etag(entry['etag'])
+    return response
+
+def fetch_market_data(source, api_type, symbol, interval):
+    """Live Yahoo/Binance API data, recorded or replayed according to MARKET_MODE"""
+    fetch = test_yahoo_api if source == 'yahoo' else test_binance_api
+    return market_feed.fetch(
+        'api', [source, api_type, symbol, interval],
+        lambda: fetch(api_type, symbol, interval)
+    )
+
+def api_key_interval(api_type, interval):
+    """Only historical data depends on the interval; other API types share one key"""
+    return interval if api_type == 'historical' else None
+
+def refresh_test_api(source, api_type, symbol, interval):
+    """Fetch a live market snapshot or kline series and store its encoded response"""
+    interval = api_key_interval(api_type, interval)
+    test_data = fetch_market_data(source, api_type, symbol, interval)
+    if test_data is None:
+        return None
+    
+    if api_type == 'historical':
+        bars, ttl = test_data['data'], RESPONSE_CACHE_TTL.get(interval, 60)
+        # Yahoo history is always fetched as daily bars
+        quality_interval = '1d' if source == 'yahoo' else interval
+        with tracer.span('quality_score'):
+            test_data['quality'] = score_bars(bars, quality_interval, is_trading_days_only(source, symbol))
+    else:
+        bars, ttl = [test_data], MARKET_SNAPSHOT_TTL
+    payload = {
+        'success': True,
+        'message': 'API test successful',
+        'data': test_data
+    }
+    return store_response(('test-api', source, api_type, symbol, interval), payload, bars, ttl)
+
+def is_trading_days_only(source, symbol):
+    """Yahoo equities only trade on weekdays; crypto trades around the clock"""
+    return source == 'yahoo' and not symbol.endswith(('USDT', '-USD'))
+
+def note_watch_request(source, api_type, symbol, interval):
+    """Count a served request so frequently used symbols join the learned watchlist"""
+    key = (source, api_type, symbol, api_key_interval(api_type, interval))
+    with _watch_lock:
+        hits = _watch_hits.get(key)
+        if hits is None:
+            if len(_watch_hits) >= PREFETCH_WATCH_MAX_KEYS:
+                # Make room by forgetting the key seen least recently
+                del _watch_hits[min(_watch_hits, key=lambda k: _watch_hits[k][1])]
+            _watch_hits[key] = [1, time.time()]
         else:
-            return generate_generic_sample_data(symbol, 1)
+            hits[0] += 1
+            hits[1] = time.time()
+
+def configured_watchlist():
+    """Expand PREFETCH_WATCHLIST into (source, api_type, symbol, interval) keys"""
+    keys = []
+    for item in PREFETCH_WATCHLIST.split(','):
+        if ':' not in item:
+            continue
+        source, symbol = item.strip().split(':', 1)
+        source = source.lower()
+        if source not in LIVE_SOURCES:
+            continue
+        keys.append((source, 'market', symbol, None))
+        for interval in PREFETCH_INTERVALS:
+            keys.append((source, 'historical', symbol, interval.strip()))
+    return keys
+
+def learned_watchlist():
+    """Most requested keys seen recently; idle keys are forgotten"""
+    cutoff = time.time() - PREFETCH_IDLE_SECONDS
+    with _watch_lock:
+        for key in [k for k, (_, last_seen) in _watch_hits.items() if last_seen < cutoff]:
+            del _watch_hits[key]
+        ranked = sorted(_watch_hits.items(), key=lambda item: item[1][0], reverse=True)
+    return [key for key, _ in ranked[:PREFETCH_LEARNED_MAX]]
+
+def prefetch_due_at(key):
+    """Time the key should next be refreshed: late in its lifetime, but never inside a failure backoff"""
+    due_at = 0
+    with _response_cache_lock:
+        entry = _response_cache.get(('test-api',) + key)
+        if entry is not None:
+            due_at = entry['expires_at'] - entry['ttl'] * PREFETCH_LEAD_FRACTION
+    with _watch_lock:
+        failure = _prefetch_failures.get(key)
+    # A stale entry stays cached until read, so the backoff must win over it
+    return max(due_at, failure[1]) if failure else due_at
+
+def note_prefetch_result(key, ok):
+    """Clear the backoff after a success; double it after each failure"""
+    with _watch_lock:
+        if ok:
+            _prefetch_failures.pop(key, None)
+            return
+        failures = _prefetch_failures.get(key, [0, 0])[0] + 1
+        backoff = min(PREFETCH_FAILURE_BACKOFF * 2 ** (failures - 1), PREFETCH_FAILURE_BACKOFF_MAX)
+        _prefetch_failures[key] = [failures, time.time() + backoff]
+
+def prefetch_loop():
+    """Keep watched responses warm, spending at most the per-minute upstream budget"""
+    budget = PREFETCH_MAX_CALLS_PER_MINUTE
+    refill_rate = PREFETCH_MAX_CALLS_PER_MINUTE / 60.0
+    last_refill = time.time()
+    while True:
+        now = time.time()
+        budget = min(PREFETCH_MAX_CALLS_PER_MINUTE, budget + (now - last_refill) * refill_rate)
+        last_refill = now
+        
+        watchlist = list(dict.fromkeys(configured_watchlist() + learned_watchlist()))
+        with _watch_lock:
+            # Failures of keys that left the watchlist are no longer needed
+            for key in [k for k in _prefetch_failures if k not in watchlist]:
+                del _prefetch_failures[key]
+        # Most overdue first, so no key can hold the budget by its position in the list
+        due = sorted(((prefetch_due_at(key), key) for key in watchlist), key=lambda item: item[0])
+        for due_at, key in due:
+            if budget < 1 or due_at > now:
+                break
+            budget -= 1
+            try:
+                ok = refresh_test_api(*key) is not None
+            except Exception as e:
+                print(f"Prefetch error for {key}: {e}")
+                ok = False
+            note_prefetch_result(key, ok)
+        time.sleep(1)
+
+def start_prefetcher():
+    """Start the background cache warmer"""
+    if not PREFETCH_ENABLED:
+        return
+    threading.Thread(target=prefetch_loop, name='prefetch', daemon=True).start()
 
 def generate_exchange_sample_data(symbol, limit):
     base_price = 45000 if 'BTC' in symbol else 3000 if 'ETH' in symbol else 100
@@ -441,8 +882,7 @@ def generate_yahoo_sample_data(symbol, limit):
             'low': price * (1 - random.random() * 0.015),
             'close': price,
             'volume': random.randint(1000000, 5000000),
-            'source': 'yahoo',
-            'qualityScore': 0.95
+            'source': 'yahoo'
         })
     
     return data
@@ -519,5 +959,19 @@ def generate_realtime_data_sample(symbol):
         'source': 'realtime-api'
     }
 
+PROBES = {'yahoo': probe_yahoo, 'binance': probe_binance, 'binance-ws': probe_binance_ws, 'okx': probe_okx}
+latency_monitor = LatencyMonitor(
+    {name: PROBES[name] for name in PROBE_SOURCES if name in PROBES},
+    interval_seconds=PROBE_INTERVAL_SECONDS,
+    source_intervals=PROBE_SOURCE_INTERVALS
+)
+
 if __name__ == '__main__':
+    # The debug reloader serves from a child process; only warm caches there
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Replay must not touch the real upstreams, and a prefetch lookup would
+        # start the replay clock before any client asked for it
+        if not market_feed.replaying:
+            start_prefetcher()
+            latency_monitor.start()
     app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file